@@ -31,6 +31,22 @@ Usage examples:
 
         $ python tdms2x.py -n x y z w u -so mat test_data/dev2_1.tdms
 
+    - Streaming channel data chunk by chunk as Arrow IPC record batches to stdout, so that
+      the output can be piped to another process without writing an intermediate file.
+
+        $ python tdms2x.py -o arrow -w - test_data/dev2_1.tdms | consumer
+
+    - Batch converting all TDMS file in "test_data" folder to .mat file with .digest sidecar
+      files, and verifying the outputs later with the same options.
+
+        $ python tdms2x.py -g blake2b -o mat test_data
+        $ python tdms2x.py -V -o mat test_data
+
+    - Exporting only the windows of 2000 samples before and 5000 samples after the rising
+      edges of the 1st channel crossing 0.5, one .mat file for each event.
+
+        $ python tdms2x.py -e edge -j 0 -l 0.5 -p 2000 5000 -o mat test_data/dev2_1.tdms
+
 Note:
     1. Names for the target file are auto generated with the combination of source file name,
        recording datetime, and/or channel names. Converted files are written into the same folder
@@ -40,13 +56,26 @@ Note:
        the required file PATH right after arguments of "-c" and "-n", it will be treated
        as if PATH is part of the sequence of these variable length arguments, and you should be
        prompt with error like "error: the following arguments are required: PATH".
-    3. The code does not test against TDMS file contains multiple groups, scaled data, and
+    3. When writing to stdout with "-w -", only the streaming formats "arrow" and "raw" are
+       accepted, channels are not split, and console messages are redirected to stderr. The
+       "raw" stream of each file starts with the magic b'T2XR', a uint32 header length, and a
+       UTF-8 JSON header describing dtype and channel names, followed by frames of a uint32
+       row count and the interleaved little-endian samples. A zero row count ends the stream.
+       Each event of "-e" option is a stream, and its "event" index, "start" and "stop" samples
+       are saved in the JSON header of "raw", or as JSON values of the "arrow" schema metadata.
+       If the consumer exits early, the conversion stops quietly with exit code 141.
+    4. The code does not test against TDMS file contains multiple groups, scaled data, and
        non-waveform data.
 
 Author: James Chang <twmr7@outlook.com>
 Date: 2020-09-22
 """
+import os
 import sys
+import json
+import hashlib
+import struct
+import itertools
 import numpy as np
 from nptdms import TdmsFile
 from pathlib import Path
@@ -100,6 +129,26 @@ def write_meta2file(input_file):
         result_code = print_metainfo(input_file, fout)
     return result_code
 
+def read_channel_meta(channel):
+    """gather meta information about the recording of a TDMS channel.
+
+    [Parameters]:
+        channel - TdmsChannel, the channel object from nptdms
+
+    [Returns]:
+        meta_info - dict, name, unit, and waveform information of the channel
+    """
+    meta_info = dict()
+    meta_info['name'] = channel.name
+    meta_info['unit'] = channel.properties['unit_string']
+    # extract waveform information 
+    if 'wf_samples' in channel.properties.keys():
+        str_rec_time = np.datetime_as_string(channel.properties['wf_start_time'], timezone='local')
+        meta_info['wf_start_time'] = datetime.strptime(str_rec_time, '%Y-%m-%dT%H:%M:%S.%f%z')
+        meta_info['wf_start_offset'] = channel.properties['wf_start_offset']
+        meta_info['wf_increment'] = channel.properties['wf_increment']
+    return meta_info
+
 def read_tdms2array(input_file, channel_selection=[], time_track=False):
     """read data from TDMS file to numpy ndarray.
 
@@ -134,25 +183,65 @@ def read_tdms2array(input_file, channel_selection=[], time_track=False):
         for n, index in enumerate(channel_selection):
             channel = all_channels[index]
             data_array[:, n+offset] = channel[:]
-            meta_info = dict()
-            meta_info['name'] = channel.name
-            meta_info['unit'] = channel.properties['unit_string']
-            # extract waveform information 
-            if 'wf_samples' in channel.properties.keys():
-                str_rec_time = np.datetime_as_string(channel.properties['wf_start_time'], timezone='local')
-                meta_info['wf_start_time'] = datetime.strptime(str_rec_time, '%Y-%m-%dT%H:%M:%S.%f%z')
-                meta_info['wf_start_offset'] = channel.properties['wf_start_offset']
-                meta_info['wf_increment'] = channel.properties['wf_increment']
-            meta_list.append(meta_info)
+            meta_list.append(read_channel_meta(channel))
     return data_array, meta_list
 
+def read_tdms2chunks(input_file, channel_selection=[], time_track=False, chunk_size=65536):
+    """read data from TDMS file as a sequence of numpy ndarray chunks, only one chunk of
+    rows is held in memory at a time.
+
+    [Parameters]:
+        input_file - str or path object, the path to a TDMS file
+        channel_selection - list, index of channel to select as output, empty equals select all
+        time_track - bool, prepend time track column if this info is available
+        chunk_size - int, maximum number of rows in each chunk
+
+    [Returns]:
+        chunks - generator of np.ndarray, the channel data chunk by chunk, at least one chunk
+        meta_list - list of dict, meta information about the recording of each channel
+    """
+    meta_list = list()
+    with TdmsFile.open(input_file) as tdms_file:
+        all_channels = tdms_file.groups()[0].channels()
+        # prepare the list of indexes of selected channels
+        if channel_selection == None or len(channel_selection) == 0:
+            channel_selection = list(range(len(all_channels)))
+        with_timetrack = time_track and 'wf_increment' in all_channels[0].properties.keys()
+        if with_timetrack:
+            meta_list.append({'name': 'time'})
+        for index in channel_selection:
+            meta_list.append(read_channel_meta(all_channels[index]))
+
+    def generate_chunks():
+        with TdmsFile.open(input_file) as tdms_file:
+            all_channels = tdms_file.groups()[0].channels()
+            # decide the shape of output chunks from the first channel
+            n_row = len(all_channels[0])
+            n_col = len(meta_list)
+            offset = 1 if with_timetrack else 0
+            if with_timetrack:
+                wf_start_offset = all_channels[0].properties['wf_start_offset']
+                wf_increment = all_channels[0].properties['wf_increment']
+            # yield an empty chunk for empty channels, so the consumer always get the dtype
+            for start in range(0, max(n_row, 1), chunk_size):
+                stop = min(start + chunk_size, n_row)
+                chunk = np.empty((stop - start, n_col), dtype=all_channels[0].dtype)
+                if with_timetrack:
+                    chunk[:, 0] = wf_start_offset + np.arange(start, stop) * wf_increment
+                for n, index in enumerate(channel_selection):
+                    chunk[:, n+offset] = all_channels[index][start:stop]
+                yield chunk
+
+    return generate_chunks(), meta_list
+
 def prepare_names(input_file,
                   meta_info,
                   channel_names=[],
                   split_file=False,
                   extension='npy',
                   append_index='',
-                  xchange_basename=''):
+                  xchange_basename='',
+                  event_index=''):
     """gather info and generate proper names for channels and output file.
 
     [Parameters]:
@@ -163,6 +252,7 @@ def prepare_names(input_file,
         extension - str, the file extension name is also the format code
         append_index - str, index string to append to file name
         xchange_basename - str, the new basename
+        event_index - str, index string of detected event to append after the timecode
     
     [Returns]:
         new_filename - str or list, depends on split file or not
@@ -191,6 +281,8 @@ def prepare_names(input_file,
         timecode = meta_info[idxch1]['wf_start_time'].strftime('%Y%m%d-%H%M%S')
     else:
         timecode = append_index
+    if event_index != '':
+        timecode += '-ev' + event_index
     # build the new path name
     parentpath = Path(input_file).parent
     basename = str(Path(input_file).stem) if xchange_basename == '' else xchange_basename
@@ -297,6 +389,148 @@ def save_array2csv(array, output_name, channel_names=[], delimiter=' '):
         np.savetxt(output_name, array, delimiter=delimiter,
                    header=delimiter.join(channel_names), comments='', encoding='utf-8')
 
+def open_binary_output(output_name):
+    """open a binary file object to write, "-" is the standard output.
+
+    [Parameters]:
+        output_name - str, the output file name or "-"
+
+    [Returns]:
+        fout - file, the binary file object, caller should not close the standard output
+    """
+    if output_name == '-':
+        return sys.stdout.buffer
+    return open(output_name, 'wb')
+
+def close_broken_stdout():
+    """redirect the standard output to devnull after the consumer of pipe has exited, so that
+    the flush at interpreter exit does not fail again.
+
+    [Returns]:
+        result_code - int, 141 as if the process is terminated by SIGPIPE
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    return 141
+
+def save_chunks2arrow(chunks, output_name, channel_names=[], metadata={}):
+    """save array chunks as record batches of Arrow IPC streaming format
+
+    [Parameters]:
+        chunks - iterable of ndarray, channel data chunk by chunk
+        output_name - str or list, the output file name, "-" to write to stdout
+        channel_names - list of str, channel/title/column names
+        metadata - dict, extra information saved as JSON values of the schema metadata
+    """
+    import pyarrow as pa
+    chunks = iter(chunks)
+    first_chunk = next(chunks)
+    n_col = first_chunk.shape[1]
+    # fields default to the column index if names are not valid
+    if not (type(channel_names) is list and len(channel_names) == n_col):
+        channel_names = [str(n) for n in range(n_col)]
+    field_type = pa.from_numpy_dtype(first_chunk.dtype)
+    schema_metadata = {key: json.dumps(value) for key, value in metadata.items()}
+    if type(output_name) is list:
+        # split channels to multiple streams
+        assert(len(output_name) == n_col)
+        sinks = [open_binary_output(fname) for fname in output_name]
+        schemas = [pa.schema([(chname, field_type)], metadata=schema_metadata) for chname in channel_names]
+    else:
+        sinks = [open_binary_output(output_name)]
+        schemas = [pa.schema([(chname, field_type) for chname in channel_names], metadata=schema_metadata)]
+    writers = [pa.ipc.new_stream(sink, schema) for sink, schema in zip(sinks, schemas)]
+    try:
+        for chunk in itertools.chain([first_chunk], chunks):
+            columns = [pa.array(np.ascontiguousarray(chunk[:,n])) for n in range(n_col)]
+            if len(writers) == 1:
+                writers[0].write_batch(pa.record_batch(columns, schema=schemas[0]))
+            else:
+                for writer, schema, column in zip(writers, schemas, columns):
+                    writer.write_batch(pa.record_batch([column], schema=schema))
+        # end of stream is marked only if all batches are written
+        for writer in writers:
+            writer.close()
+        if sys.stdout.buffer in sinks:
+            sys.stdout.buffer.flush()
+    finally:
+        for sink in sinks:
+            if sink is not sys.stdout.buffer:
+                sink.close()
+
+def save_chunks2raw(chunks, output_name, channel_names=[], metadata={}):
+    """save array chunks as raw interleaved little-endian frames, with a small header
+
+    [Parameters]:
+        chunks - iterable of ndarray, channel data chunk by chunk
+        output_name - str or list, the output file name, "-" to write to stdout
+        channel_names - list of str, channel/title/column names
+        metadata - dict, extra information saved in the JSON header
+    """
+    chunks = iter(chunks)
+    first_chunk = next(chunks)
+    n_col = first_chunk.shape[1]
+    dtype = first_chunk.dtype.newbyteorder('<')
+    if not (type(channel_names) is list and len(channel_names) == n_col):
+        channel_names = [str(n) for n in range(n_col)]
+    if type(output_name) is list:
+        # split channels to multiple streams
+        assert(len(output_name) == n_col)
+        sinks = [open_binary_output(fname) for fname in output_name]
+        headers = [[chname] for chname in channel_names]
+    else:
+        sinks = [open_binary_output(output_name)]
+        headers = [channel_names]
+    try:
+        # header: magic, uint32 length, and JSON text of dtype, channel names, and metadata
+        for sink, names in zip(sinks, headers):
+            header = dict(metadata)
+            header.update({'dtype': dtype.str, 'channels': names})
+            header = json.dumps(header).encode('utf-8')
+            sink.write(b'T2XR' + struct.pack('<I', len(header)) + header)
+        # frame: uint32 row count, and interleaved samples of these rows
+        for chunk in itertools.chain([first_chunk], chunks):
+            if chunk.shape[0] == 0:
+                continue
+            chunk = np.ascontiguousarray(chunk, dtype=dtype)
+            if len(sinks) == 1:
+                sinks[0].write(struct.pack('<I', chunk.shape[0]) + chunk.tobytes())
+            else:
+                for n, sink in enumerate(sinks):
+                    sink.write(struct.pack('<I', chunk.shape[0]) + chunk[:,n].tobytes())
+        # zero row count marks the end of stream
+        for sink in sinks:
+            sink.write(struct.pack('<I', 0))
+        if sys.stdout.buffer in sinks:
+            sys.stdout.buffer.flush()
+    finally:
+        for sink in sinks:
+            if sink is not sys.stdout.buffer:
+                sink.close()
+
+def write_chunks2file(chunks, output_name, channel_names=[], output_format='', metadata={}):
+    """export and write numpy array chunks to specific streaming file format.
+
+    [Parameters]:
+        chunks - iterable of ndarray, channel data chunk by chunk
+        output_name - str or list, the output file name, "-" to write to stdout
+        channel_names - list of str, channel/title/column names
+        output_format - str, the format code, required if output_name is "-"
+        metadata - dict, extra information saved in the stream header
+    """
+    if output_format == '':
+        if type(output_name) is list:
+            output_format = Path(output_name[0]).suffix[1:]
+        else:
+            output_format = Path(output_name).suffix[1:]
+
+    if output_format == 'arrow':
+        save_chunks2arrow(chunks, output_name, channel_names, metadata)
+    elif output_format == 'raw':
+        save_chunks2raw(chunks, output_name, channel_names, metadata)
+    else:
+        print('Target format {} does not support streaming.'.format(output_format), file=sys.stderr)
+
 def write_array2file(array, output_name, channel_names=[], dozip=False, sampling_rate=100000):
     """export and write numpy array to specific file format.
 
@@ -321,9 +555,324 @@ def write_array2file(array, output_name, channel_names=[], dozip=False, sampling
         save_array2wav(array, output_name, sampling_rate) 
     elif output_format == '.csv':
         save_array2csv(array, output_name, channel_names) 
+    elif output_format in ('.arrow', '.raw'):
+        write_chunks2file([array], output_name, channel_names)
     else:
         print('Target format {} not supported.'.format(output_format), file=sys.stderr)
 
+def detect_triggers(chunk, column, carry, detector='level', level=0.0, window=256):
+    """vectorized trigger detection on one channel of an array chunk.
+
+    [Parameters]:
+        chunk - ndarray, channel data chunk
+        column - int, index of the column to detect on
+        carry - ndarray, samples carried over from the end of previous chunk, empty at start
+        detector - str, "level" triggers on every sample with magnitude above level, "edge"
+                   triggers where signal crosses level upward, or downward if level is negative,
+                   and "energy" triggers where the RMS of last window samples is above level
+        level - float, the trigger level
+        window - int, number of samples to calculate RMS for the "energy" detector
+
+    [Returns]:
+        mask - ndarray of bool, trigger flag of each row in the chunk
+        carry - ndarray, samples to carry over to the next chunk
+    """
+    x = chunk[:, column]
+    if len(x) == 0:
+        return np.zeros(0, dtype=bool), carry
+    if detector == 'level':
+        return np.abs(x) >= level, carry
+    elif detector == 'edge':
+        y = np.concatenate((carry, x))
+        if level >= 0:
+            mask = (y[:-1] < level) & (y[1:] >= level)
+        else:
+            mask = (y[:-1] > level) & (y[1:] <= level)
+        # the very first sample has nothing to compare with
+        if len(carry) == 0:
+            mask = np.concatenate(([False], mask))
+        return mask, y[-1:]
+    elif detector == 'energy':
+        # zeros are assumed before the first sample
+        if len(carry) == 0:
+            carry = np.zeros(window - 1)
+        y = np.concatenate((carry, x.astype(np.float64) ** 2))
+        csum = np.concatenate(([0.0], np.cumsum(y)))
+        mean_square = (csum[window:] - csum[:-window]) / window
+        return mean_square >= level ** 2, y[len(y) - (window - 1):]
+    else:
+        raise ValueError('Trigger detector {} not supported.'.format(detector))
+
+def segment_events(chunks, column, detector='level', level=0.0, margins=(1000, 1000), window=256):
+    """cut array chunks into windows around detected events. Detection, pre-trigger history,
+    and events span across chunk boundaries are carried over to the next chunk. The window of
+    a trigger includes the trigger sample itself, and overlapping or adjacent windows are
+    merged into one event.
+
+    [Parameters]:
+        chunks - iterable of ndarray, channel data chunk by chunk
+        column - int, index of the column to detect on
+        detector - str, "level", "edge", or "energy", see detect_triggers()
+        level - float, the trigger level
+        margins - tuple of int, number of pre-trigger and post-trigger samples
+        window - int, number of samples to calculate RMS for the "energy" detector
+
+    [Yields]:
+        event_start - int, index of the first sample of the event in the whole recording
+        event_array - ndarray, channel data of the event
+    """
+    pre, post = margins
+    carry = np.array([])
+    history = None
+    start = 0
+    # the event still open at the end of previous chunk
+    event_start = event_stop = filled = None
+    parts = list()
+    for chunk in chunks:
+        n_row = chunk.shape[0]
+        mask, carry = detect_triggers(chunk, column, carry, detector, level, window)
+        triggers = start + np.flatnonzero(mask)
+        # group triggers whose windows overlap or touch
+        if len(triggers) > 0:
+            breaks = np.flatnonzero(np.diff(triggers) > pre + post + 1) + 1
+            firsts = triggers[np.concatenate(([0], breaks))]
+            lasts = triggers[np.concatenate((breaks - 1, [len(triggers) - 1]))]
+            intervals = list(zip(np.maximum(firsts - pre, 0).tolist(), (lasts + post + 1).tolist()))
+        else:
+            intervals = list()
+        # rows available are pre-trigger history followed by current chunk
+        if history is not None:
+            chunk = np.concatenate((history, chunk))
+        buffer_start = start + n_row - chunk.shape[0]
+        if event_start is not None and len(intervals) > 0 and intervals[0][0] <= event_stop:
+            event_stop = max(event_stop, intervals.pop(0)[1])
+        for interval in [None] + intervals:
+            if interval is not None:
+                event_start, event_stop = interval
+                filled = event_start
+                parts = list()
+            elif event_start is None:
+                continue
+            stop = min(event_stop, start + n_row)
+            parts.append(chunk[filled-buffer_start:stop-buffer_start])
+            filled = stop
+            # close only if later triggers are too far to be merged into it
+            if filled == event_stop and start + n_row > event_stop + pre:
+                yield event_start, np.concatenate(parts)
+                event_start = event_stop = filled = None
+                parts = list()
+        history = chunk[max(chunk.shape[0] - pre, 0):].copy()
+        start += n_row
+    # the last event may be truncated by the end of recording
+    if event_start is not None:
+        yield event_start, np.concatenate(parts)
+
+def new_hasher(hash_name='blake2b'):
+    """create a hash object to digest channel content.
+
+    [Parameters]:
+        hash_name - str, "blake2b" from hashlib, or "xxh64", "xxh3_64", "xxh3_128" from xxhash
+
+    [Returns]:
+        hasher - hash object with update() and hexdigest() methods
+    """
+    if hash_name == 'blake2b':
+        return hashlib.blake2b()
+    import xxhash
+    return getattr(xxhash, hash_name)()
+
+def digest_chunks(chunks, digest_list, hash_name='blake2b', dtype=None):
+    """hash the content of each channel while passing array chunks through, so the
+    digest is computed on the fly in the same pass of reading or writing the data.
+
+    [Parameters]:
+        chunks - iterable of ndarray, channel data chunk by chunk
+        digest_list - list, filled with a dict of dtype, count, and digest for each channel
+                      after all chunks are consumed
+        hash_name - str, the name of hash algorithm
+        dtype - numpy dtype, cast channel data to this type before hashing if specified
+
+    [Yields]:
+        chunk - ndarray, the same chunk from input
+    """
+    hashers = list()
+    counts = list()
+    for chunk in chunks:
+        if len(hashers) == 0:
+            hashers = [new_hasher(hash_name) for n in range(chunk.shape[1])]
+            counts = [0] * chunk.shape[1]
+            # the little-endian bytes of samples are hashed
+            hash_dtype = np.dtype(chunk.dtype if dtype is None else dtype).newbyteorder('<')
+        for n, hasher in enumerate(hashers):
+            hasher.update(np.ascontiguousarray(chunk[:,n], dtype=hash_dtype))
+            counts[n] += chunk.shape[0]
+        yield chunk
+    for hasher, count in zip(hashers, counts):
+        digest_list.append({'dtype': hash_dtype.str, 'count': count, 'digest': hasher.hexdigest()})
+
+def digest_array(array, hash_name='blake2b', dtype=None):
+    """hash the content of each channel of an array.
+
+    [Parameters]:
+        array - ndarray, channel data
+        hash_name - str, the name of hash algorithm
+        dtype - numpy dtype, cast channel data to this type before hashing if specified
+
+    [Returns]:
+        digest_list - list of dict, dtype, count, and digest of each channel
+    """
+    digest_list = list()
+    for chunk in digest_chunks([array], digest_list, hash_name, dtype):
+        pass
+    return digest_list
+
+def write_digest2file(digest_list, output_name, channel_names=[], hash_name='blake2b', input_file=''):
+    """save channel digests to sidecar files, the sidecar is saved under the same folder
+    of the output file with suffix extension name changed to '.digest'.
+
+    [Parameters]:
+        digest_list - list of dict, dtype, count, and digest of each channel
+        output_name - str or list, the output file name
+        channel_names - list of str, channel/title/column names
+        hash_name - str, the name of hash algorithm
+        input_file - str or path object, the path to the source TDMS file
+    """
+    if type(output_name) is list:
+        # one sidecar for each split file
+        assert(len(output_name) == len(digest_list))
+        groups = [(fname, [n]) for n, fname in enumerate(output_name)]
+    else:
+        groups = [(output_name, list(range(len(digest_list))))]
+    for fname, indexes in groups:
+        channels = list()
+        for n in indexes:
+            channel = {'name': channel_names[n] if n < len(channel_names) else str(n)}
+            channel.update(digest_list[n])
+            channels.append(channel)
+        sidecar = {'source': str(input_file), 'hash': hash_name, 'channels': channels}
+        with open(Path(fname).with_suffix('.digest'), 'w', encoding='utf-8') as fout:
+            json.dump(sidecar, fout, indent=2)
+
+def read_file2chunks(output_name, dozip=False, chunk_size=65536):
+    """read back a converted output file as a sequence of numpy ndarray chunks, the npy,
+    wav, arrow, and raw formats are read chunk by chunk without loading the whole file.
+
+    [Parameters]:
+        output_name - str or path object, the output file name
+        dozip - bool, the npy output was compressed to npz
+        chunk_size - int, maximum number of rows in each chunk
+
+    [Yields]:
+        chunk - ndarray, 2-D channel data chunk
+    """
+    output_format = Path(output_name).suffix
+    if output_format == '.npy' and dozip:
+        with np.load(Path(output_name).with_suffix('.npz')) as npz:
+            arrays = [npz[key] for key in npz.files]
+        array = arrays[0].reshape(len(arrays[0]), -1) if len(arrays) == 1 else np.column_stack(arrays)
+    elif output_format == '.npy':
+        array = np.load(output_name, mmap_mode='r')
+    elif output_format == '.mat':
+        import scipy.io as sio
+        mdict = sio.loadmat(output_name)
+        array = np.column_stack([mdict[key].ravel() for key in mdict.keys() if not key.startswith('__')])
+    elif output_format == '.wav':
+        from scipy.io import wavfile
+        _, array = wavfile.read(output_name, mmap=True)
+    elif output_format == '.csv':
+        array = np.loadtxt(output_name, skiprows=1, ndmin=2, encoding='utf-8')
+    elif output_format == '.arrow':
+        import pyarrow as pa
+        with pa.ipc.open_stream(pa.OSFile(str(output_name))) as reader:
+            for batch in reader:
+                yield np.column_stack([column.to_numpy() for column in batch.columns])
+        return
+    elif output_format == '.raw':
+        with open(output_name, 'rb') as fin:
+            # a truncated stream is reported as invalid content
+            def read_exact(size):
+                buffer = fin.read(size)
+                if len(buffer) != size:
+                    raise ValueError('stream is truncated')
+                return buffer
+            assert(read_exact(4) == b'T2XR')
+            header = json.loads(read_exact(struct.unpack('<I', read_exact(4))[0]))
+            dtype = np.dtype(header['dtype'])
+            n_col = len(header['channels'])
+            while True:
+                n_row = struct.unpack('<I', read_exact(4))[0]
+                if n_row == 0:
+                    break
+                yield np.frombuffer(read_exact(n_row * n_col * dtype.itemsize), dtype).reshape(n_row, n_col)
+        return
+    else:
+        raise ValueError('Target format {} not supported.'.format(output_format))
+    array = array.reshape(len(array), -1)
+    for start in range(0, max(len(array), 1), chunk_size):
+        yield array[start:start+chunk_size]
+
+def verify_output(output_name, source_chunks=None, hash_name='blake2b', dozip=False, chunk_size=65536,
+                  output_file=sys.stdout):
+    """check output files against their '.digest' sidecar, or against the source TDMS data if
+    the sidecar is not found. Each output and the source are read in one streaming pass.
+
+    [Parameters]:
+        output_name - str or list, the output file name
+        source_chunks - iterable of ndarray, the source data chunk by chunk, None to check against
+                        the sidecar only
+        hash_name - str, the name of hash algorithm if sidecar is not found
+        dozip - bool, the npy output was compressed to npz
+        chunk_size - int, maximum number of rows in each chunk
+        output_file - file, the target file object to output the report
+
+    [Returns]:
+        result_code - int, 0 if all outputs match, otherwise -3
+    """
+    output_names = output_name if type(output_name) is list else [output_name]
+    source_digest = list()
+    result_code = 0
+    for n, fname in enumerate(output_names):
+        sidecar_name = Path(fname).with_suffix('.digest')
+        if sidecar_name.exists():
+            with open(sidecar_name, 'r', encoding='utf-8') as fin:
+                sidecar = json.load(fin)
+            file_hash = sidecar['hash']
+            expected = sidecar['channels']
+            against = str(sidecar_name)
+        elif source_chunks is None:
+            print('    [MISMATCH] {} against {}: sidecar not found.'.format(fname, sidecar_name), file=output_file)
+            result_code = -3
+            continue
+        else:
+            # digest the source only once, and only if it is needed
+            if len(source_digest) == 0:
+                for chunk in digest_chunks(source_chunks, source_digest, hash_name):
+                    pass
+            file_hash = hash_name
+            expected = source_digest[n:n+1] if type(output_name) is list else source_digest
+            against = 'source'
+        messages = list()
+        try:
+            actual = list()
+            dtype = expected[0]['dtype'] if len(expected) > 0 else None
+            for chunk in digest_chunks(read_file2chunks(fname, dozip, chunk_size), actual, file_hash, dtype):
+                pass
+            if len(actual) != len(expected):
+                messages.append('{} channels found, {} expected'.format(len(actual), len(expected)))
+            for m, (act, exp) in enumerate(zip(actual, expected)):
+                if act['count'] != exp['count']:
+                    messages.append('channel #{} has {} samples, {} expected'.format(m+1, act['count'], exp['count']))
+                elif act['digest'] != exp['digest']:
+                    messages.append('channel #{} content digest mismatch'.format(m+1))
+        except (OSError, ValueError, AssertionError) as err:
+            messages.append('unable to read output, {}'.format(err))
+        if len(messages) == 0:
+            print('    [OK] {} matches {}.'.format(fname, against), file=output_file)
+        else:
+            print('    [MISMATCH] {} against {}: {}.'.format(fname, against, '; '.join(messages)), file=output_file)
+            result_code = -3
+    return result_code
+
 # -----------------------------------------------------------------------------
 # __name__ == "__main__"
 #   the execution entry point only when this script is executed with:
@@ -363,14 +912,53 @@ if __name__ == "__main__":
                         Default is to use the name from TDMS meta info. If option -t is specified,
                         the first name in the list is the name for time track. For those file formats
                         without annotation property, e.g. npy, channel names are silently ignored.''')
-    parser.add_argument('-o','--output_format', type=str, choices=['npy','mat','wav','csv'], default='npy',
+    parser.add_argument('-o','--output_format', type=str, choices=['npy','mat','wav','csv','arrow','raw'],
+                        default='npy',
                         help='''Select an output type from currently implemented formats. Default is
                         to use "npy" format if this option is missing. For "wav" file format, the
-                        -r option shall explicit specify and -s option is auto implied.''')
+                        -r option shall explicit specify and -s option is auto implied. The "arrow"
+                        (Arrow IPC stream) and "raw" (interleaved little-endian frames) formats are
+                        written chunk by chunk.''')
+    parser.add_argument('-k','--chunk_size', type=int, metavar='N', default=65536,
+                        help='''Number of rows per chunk to read and write data chunk by chunk, e.g. for
+                        the "arrow" and "raw" streaming formats.''')
+    parser.add_argument('-g','--hash_digest', type=str, choices=['blake2b','xxh64','xxh3_64','xxh3_128'],
+                        default=None,
+                        help='''Compute per-channel content digest and sample count while converting, and
+                        save them to a .digest sidecar file next to the output. The xxh* algorithms
+                        require the xxhash package.''')
+    parser.add_argument('-V','--verify', action='store_true',
+                        help='''Verify the existing output files of the same options instead of converting,
+                        against their .digest sidecar files, or against the source TDMS if sidecar is
+                        not found. Outputs of events (-e) are listed by their .events file, and are
+                        checked against their sidecar files only.''')
     parser.add_argument('-r','--rate_sampling', type=int, metavar='Hz', default=100000,
                         help='The sampling rate in Hz for .wav file format.')
     parser.add_argument('-x','--xchange_basename', type=str, metavar='NAME', default='',
                         help='Replace original basename with a meaningful name.')
+    parser.add_argument('-e','--event_detect', type=str, choices=['level','edge','energy'], default=None,
+                        help='''Write only the windows around events detected on the trigger channel, one
+                        file (or set of split files) for each event, named with an appended event
+                        index. The "level" detector triggers on samples with magnitude above the
+                        level, "edge" triggers where signal crosses the level upward (downward if the
+                        level is negative), and "energy" triggers where the RMS of a moving window is
+                        above the level. The start and stop samples of events are saved to a .events
+                        file. Requires the -l option.''')
+    parser.add_argument('-j','--trigger_channel', type=int, metavar='INDEX', default=0,
+                        help='''Index of the channel to detect events on, zero is the index to the first
+                        channel and it shall also be selected by the -c option.''')
+    parser.add_argument('-l','--trigger_level', type=float, metavar='LEVEL', default=None,
+                        help='The trigger level of event detector.')
+    parser.add_argument('-p','--trigger_margins', nargs=2, type=int, metavar=('PRE','POST'),
+                        default=[1000, 1000],
+                        help='''Number of pre-trigger and post-trigger samples to write around each
+                        trigger sample. Events with overlapping or adjacent windows are merged.''')
+    parser.add_argument('-q','--energy_window', type=int, metavar='N', default=256,
+                        help='Number of samples of the moving window for the "energy" detector.')
+    parser.add_argument('-w','--write_target', type=str, choices=['-'], default=None,
+                        help='''Write the output to stdout instead of files next to the source, only
+                        the "arrow" and "raw" formats are accepted. Console messages are redirected
+                        to stderr.''')
     parser.add_argument('input_path', metavar='PATH', type=str,
                         help='Path to a TDMS file or a folder contains plenty of it.')
 
@@ -393,6 +981,34 @@ if __name__ == "__main__":
     else:
         sys.exit('[Error]: path {} is not a file or folder.'.format(args.input_path))
 
+    if args.chunk_size < 1:
+        sys.exit('[Error]: chunk size {} is not a positive number.'.format(args.chunk_size))
+    # the xxh* digests need the optional xxhash package
+    if args.hash_digest is not None and args.hash_digest != 'blake2b':
+        try:
+            import xxhash
+        except ImportError:
+            sys.exit('[Error]: digest {} requires the xxhash package.'.format(args.hash_digest))
+
+    # streaming to stdout accepts only streaming formats, and never splits channels
+    to_stdout = args.write_target == '-'
+    if to_stdout:
+        if args.output_format not in ('arrow', 'raw'):
+            sys.exit('[Error]: format {} can not be written to stdout.'.format(args.output_format))
+        args.split_file = False
+        if args.hash_digest is not None or args.verify:
+            sys.exit('[Error]: digest and verification are not supported when writing to stdout.')
+    # event detection needs a level, but verifying the outputs of events does not
+    if args.event_detect is not None:
+        if args.trigger_level is None and not args.verify:
+            sys.exit('[Error]: the trigger level -l is required to detect events.')
+        if min(args.trigger_margins) < 0:
+            sys.exit('[Error]: trigger margins {} shall not be negative.'.format(args.trigger_margins))
+        if args.energy_window < 1:
+            sys.exit('[Error]: energy window {} is not a positive number.'.format(args.energy_window))
+    # keep stdout clean for the data stream
+    msgout = sys.stderr if to_stdout else sys.stdout
+
     # force channel splitting for wav file format
     if args.output_format == 'wav':
         args.split_file = True
@@ -407,6 +1023,8 @@ if __name__ == "__main__":
         index_width = len(str(len(tdms_files)))
 
     result_code = 0
+    # format of index to append to the output file name
+    fmtstr = '{:0'+ str(index_width) +'}'
     # iterating over all files
     for n, input_file in enumerate(tdms_files):
         if args.display_info:
@@ -414,8 +1032,115 @@ if __name__ == "__main__":
             result_code += print_metainfo(input_file)
             if args.meta_save2file:
                 result_code += write_meta2file(input_file)
+        elif args.verify:
+            print(' -- #{} file {}, start verifying.'.format(n+1, input_file), flush=True)
+            t_start = time.time()
+            # output names are prepared the same way as converting
+            chunks, meta = read_tdms2chunks(input_file, args.channel_selection, args.time_track,
+                                            args.chunk_size)
+            channel_names = list() if args.name_channel is None else args.name_channel
+            append_index = fmtstr.format(n+1) if args.index_append else str()
+            file_name, channel_names = prepare_names(input_file,
+                                                     meta,
+                                                     channel_names,
+                                                     args.split_file,
+                                                     args.output_format,
+                                                     append_index,
+                                                     args.xchange_basename)
+            hash_name = 'blake2b' if args.hash_digest is None else args.hash_digest
+            dozip = args.zip_compression and args.output_format == 'npy'
+            if args.event_detect is None:
+                result_code += verify_output(file_name, chunks, hash_name, dozip, args.chunk_size)
+            else:
+                # outputs of events are listed in the .events index, and checked against sidecars
+                events_name, _ = prepare_names(input_file, meta, [], False, 'events', append_index,
+                                               args.xchange_basename)
+                try:
+                    with open(events_name, 'r', encoding='utf-8') as fin:
+                        events = [int(line.split()[0]) for line in fin.readlines()[1:] if line.strip() != '']
+                except (OSError, ValueError) as err:
+                    print('    [MISMATCH] unable to read events index {}: {}'.format(events_name, err))
+                    events = list()
+                    result_code += -3
+                for event in events:
+                    channel_names = list() if args.name_channel is None else args.name_channel
+                    file_name, channel_names = prepare_names(input_file,
+                                                             meta,
+                                                             channel_names,
+                                                             args.split_file,
+                                                             args.output_format,
+                                                             append_index,
+                                                             args.xchange_basename,
+                                                             '{:04}'.format(event))
+                    result_code += verify_output(file_name, None, hash_name, dozip, args.chunk_size)
+            print(' -- #{} file verifying time {}sec.\n'.format(n+1, time.time() - t_start))
+        elif args.event_detect is not None:
+            print(' -- #{} file {}, start detecting events.'.format(n+1, input_file), file=msgout, flush=True)
+            t_start = time.time()
+            # save the meta info if asked to do so
+            if args.meta_save2file:
+                result_code += write_meta2file(input_file)
+                if result_code != 0:
+                    print('Something is wrong while saving meta info, abort further processing.', file=sys.stderr)
+                    break
+            chunks, meta = read_tdms2chunks(input_file, args.channel_selection, args.time_track,
+                                            args.chunk_size)
+            # locate the column of trigger channel
+            offset = 1 if meta[0]['name'] == 'time' else 0
+            if args.channel_selection is None or len(args.channel_selection) == 0:
+                column = args.trigger_channel + offset
+            elif args.trigger_channel in args.channel_selection:
+                column = args.channel_selection.index(args.trigger_channel) + offset
+            else:
+                sys.exit('[Error]: trigger channel {} is not selected.'.format(args.trigger_channel))
+            if column >= len(meta):
+                sys.exit('[Error]: trigger channel {} does not exist.'.format(args.trigger_channel))
+            append_index = fmtstr.format(n+1) if args.index_append else str()
+            events = list()
+            for m, (event_start, event) in enumerate(segment_events(chunks, column,
+                                                                    args.event_detect,
+                                                                    args.trigger_level,
+                                                                    args.trigger_margins,
+                                                                    args.energy_window)):
+                channel_names = list() if args.name_channel is None else args.name_channel
+                # prepare output file name with event index
+                file_name, channel_names = prepare_names(input_file,
+                                                         meta,
+                                                         channel_names,
+                                                         args.split_file,
+                                                         args.output_format,
+                                                         append_index,
+                                                         args.xchange_basename,
+                                                         '{:04}'.format(m+1))
+                if to_stdout:
+                    file_name = '-'
+                print('    write event #{} of samples [{}, {}) to file(s):'.format(m+1, event_start,
+                      event_start + len(event)), file_name, file=msgout)
+                if args.output_format in ('arrow', 'raw'):
+                    try:
+                        # index and samples of event are kept in the stream header
+                        write_chunks2file([event], file_name, channel_names, args.output_format,
+                                          {'event': m+1, 'start': event_start,
+                                           'stop': event_start + len(event)})
+                    except BrokenPipeError:
+                        # the consumer has exited, stop quietly like other filters
+                        sys.exit(close_broken_stdout())
+                else:
+                    write_array2file(event, file_name, channel_names, args.zip_compression, args.rate_sampling)
+                if args.hash_digest is not None:
+                    write_digest2file(digest_array(event, args.hash_digest), file_name, channel_names,
+                                      args.hash_digest, input_file)
+                events.append((m+1, event_start, event_start + len(event)))
+            # save the index of events next to the outputs
+            if not to_stdout:
+                events_name, _ = prepare_names(input_file, meta, [], False, 'events', append_index,
+                                               args.xchange_basename)
+                np.savetxt(events_name, np.array(events, dtype=np.int64).reshape(-1, 3), fmt='%d',
+                           header='event start stop', comments='', encoding='utf-8')
+            print(' -- #{} file {} events, processing time {}sec.\n'.format(n+1, len(events),
+                  time.time() - t_start), file=msgout)
         else:
-            print(' -- #{} file {}, start processing.'.format(n+1, input_file), flush=True)
+            print(' -- #{} file {}, start processing.'.format(n+1, input_file), file=msgout, flush=True)
             t_start = time.time()
             # save the meta info if asked to do so
             if args.meta_save2file:
@@ -423,12 +1148,15 @@ if __name__ == "__main__":
                 if result_code != 0:
                     print('Something is wrong while saving meta info, abort further processing.', file=sys.stderr)
                     break
-            # read data out of TDMS file as numpy array
-            data, meta = read_tdms2array(input_file, args.channel_selection, args.time_track)
+            # read data out of TDMS file as numpy array, or chunks for streaming formats
+            if args.output_format in ('arrow', 'raw'):
+                chunks, meta = read_tdms2chunks(input_file, args.channel_selection, args.time_track,
+                                                args.chunk_size)
+            else:
+                data, meta = read_tdms2array(input_file, args.channel_selection, args.time_track)
             # get proper output filename and header names
             channel_names = list() if args.name_channel is None else args.name_channel
             # append index to the name or not
-            fmtstr = '{:0'+ str(index_width) +'}'
             append_index = fmtstr.format(n+1) if args.index_append else str()
             # prepare output file name
             file_name, channel_names = prepare_names(input_file,
@@ -438,9 +1166,26 @@ if __name__ == "__main__":
                                                      args.output_format,
                                                      append_index,
                                                      args.xchange_basename)
-            print('    write to file(s):', file_name)
-            write_array2file(data, file_name, channel_names, args.zip_compression, args.rate_sampling)
-            print(' -- #{} file processing time {}sec.\n'.format(n+1, time.time() - t_start))
+            if to_stdout:
+                file_name = '-'
+            print('    write to file(s):', file_name, file=msgout)
+            if args.output_format in ('arrow', 'raw'):
+                digest = list()
+                if args.hash_digest is not None:
+                    # hash on the fly while the chunks are written
+                    chunks = digest_chunks(chunks, digest, args.hash_digest)
+                try:
+                    write_chunks2file(chunks, file_name, channel_names, args.output_format)
+                except BrokenPipeError:
+                    # the consumer has exited, stop quietly like other filters
+                    sys.exit(close_broken_stdout())
+            else:
+                write_array2file(data, file_name, channel_names, args.zip_compression, args.rate_sampling)
+                if args.hash_digest is not None:
+                    digest = digest_array(data, args.hash_digest)
+            if args.hash_digest is not None:
+                write_digest2file(digest, file_name, channel_names, args.hash_digest, input_file)
+            print(' -- #{} file processing time {}sec.\n'.format(n+1, time.time() - t_start), file=msgout)
 
     # end of the main application
     sys.exit(result_code)
\ No newline at end of file